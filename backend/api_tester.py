@@ -34,7 +34,7 @@ import time
 import queue
 import threading
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, Tuple, Callable
+from typing import Optional, Dict, Any, List, Tuple, Callable
 
 try:
     import requests
@@ -145,6 +145,8 @@ class RealtimeListener:
         # Dynamically register handlers
         for name in EVENT_NAMES:
             self.sio.on(name, self._make_handler(name))
+        # Events of one write request sharing the same rooms arrive grouped
+        self.sio.on("batch", self._on_batch)
 
     def _make_handler(self, name: str):
         def handler(payload):
@@ -156,13 +158,26 @@ class RealtimeListener:
                 pass
         return handler
 
-    def start(self, headers: Optional[dict] = None):
+    def _on_batch(self, payload):
+        for item in (payload or {}).get("events", []):
+            name = item.get("event")
+            if name in self._events:
+                self._make_handler(name)(item.get("data"))
+
+    def start(self, token: str, rooms: Optional[List[str]] = None):
+        """Authenticated handshake: the server refuses connections without a valid JWT."""
         url = self.base_url  # Flask-SocketIO shares same origin
         transports = ["websocket"]  # force WS for reliability
-        self.sio.connect(url, headers=headers or {}, transports=transports, wait=True)
+        self.sio.connect(url, auth={"token": token, "rooms": rooms or []}, transports=transports, wait=True)
         # small grace
         self._connected.wait(timeout=3)
 
+    def subscribe(self, rooms: List[str]) -> dict:
+        ack = self.sio.call("subscribe", {"rooms": rooms}, timeout=5) or {}
+        if ack.get("refused"):
+            _log(f"WS rooms refused: {ack['refused']}")
+        return ack
+
     def stop(self):
         try:
             self.sio.disconnect()
@@ -206,11 +221,18 @@ class APITester:
         }
 
         self.ws: Optional[RealtimeListener] = None
-        if use_ws:
-            if not HAS_SIO:
-                raise RuntimeError("Install python-socketio & websocket-client to use --ws")
-            self.ws = RealtimeListener(self.base_url, verbose=verbose)
-            self.ws.start()
+        if use_ws and not HAS_SIO:
+            raise RuntimeError("Install python-socketio & websocket-client to use --ws")
+        if token:
+            self._start_ws()
+
+    def _start_ws(self):
+        """Connect the listener once a token is known, subscribed to the current year's rooms."""
+        if not self.use_ws or self.ws is not None or not self.token:
+            return
+        fy = self._infer_current_fy()
+        self.ws = RealtimeListener(self.base_url, verbose=self.verbose)
+        self.ws.start(self.token, rooms=[f"fy:{fy}:factures", f"fy:{fy}:cdd", f"fy:{fy}:budgets"])
 
     # ---------------------- HTTP helpers ----------------------
     def _url(self, path: str) -> str:
@@ -264,10 +286,13 @@ class APITester:
             self.headers["Authorization"] = f"Bearer {self.token}"
             self.state["user"] = data.get("user")
             print(f"{_tick(True)} registered as {self.state['user']}")
+            # user.created is only seen by a listener connected before registration
+            # (--token of a gestionnaire); otherwise connect now for the next steps.
             if self.ws:
                 uid = self.state["user"]["uid"]
                 ev = self.ws.wait_for("user.created", predicate=lambda p: p.get("user", {}).get("uid") == uid, timeout=5)
                 print(("WS user.created received" if ev else "WS user.created not received"), "for uid", uid)
+            self._start_ws()
             return True, data
         elif resp.status_code == 409:
             print("[register] User already exists (409). Falling back to login.")
@@ -295,6 +320,7 @@ class APITester:
         self.headers["Authorization"] = f"Bearer {self.token}"
         self.state["user"] = data.get("user", {})
         print(f"{_tick(True)} logged in as {self.state['user']}")
+        self._start_ws()
 
     def health(self):
         self._req("GET", "/api/health", expected=(200,))
@@ -367,6 +393,8 @@ class APITester:
         data = resp.json()
         self.state["cid"] = data["cid"]
         if self.ws:
+            # cdd:<cid> carries attachment events and the linked invoices' events
+            self.ws.subscribe([f"cdd:{data['cid']}"])
             ev = self.ws.wait_for("cdd.created", predicate=lambda p: p.get("cid") == data["cid"], timeout=5)
             print("WS cdd.created", "received" if ev else "not received", f"(cid={data['cid']})")
         return data
@@ -23,6 +23,7 @@ import traceback
 import json
 from json import JSONEncoder # Importez JSONEncoder de Flask
 import pytz
+from fund_types import normalize_fund_type # Types de fonds partagés avec app2.py
 
 # Classe CustomJSONEncoder pour gérer la sérialisation de types non-standards
 class CustomJSONEncoder(JSONEncoder):
@@ -165,29 +166,6 @@ def role_required(allowed_roles):
         return decorated_function
     return decorator
 
-# Dictionnaire de mappage pour normaliser les types de fonds entre le front et la base de données
-FUND_TYPE_MAP = {
-    "Fond 1":         "fonds de type 1",
-    "fonds de type 1":"fonds de type 1",
-    "Fond 3":         "fonds de type 3",
-    "fonds de type 3":"fonds de type 3",
-}
-
-def normalize_fund_type(raw: str) -> str:
-    """
-    Normalise le type de fonds reçu du front-end pour correspondre aux valeurs attendues en base.
-    Args:
-        raw (str): Type de fonds brut (ex: 'Fond 1', 'fonds de type 3').
-    Returns:
-        str: Type de fonds normalisé.
-    Raises:
-        ValueError: Si le type de fonds est invalide.
-    """
-    normalized = FUND_TYPE_MAP.get(raw)
-    if not normalized:
-        raise ValueError(f"Type de fonds invalide: {raw!r}")
-    return normalized
-
 
 @socketio.on('connect')
 def handle_connect(auth):  # 👈 Ajoutez le paramètre `auth`
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Python-built vs PostgreSQL-built JSON on the big read endpoints
+---------------------------------------------------------------------------
+Calls the endpoints in-process through the Flask test client (real database,
+no HTTP server), alternating ?json_mode=python and ?json_mode=db:
+  - GET /api/factures?fy=<fy>                 (full year, LEFT JOIN compte_depenses)
+  - GET /api/depense-comptes/<cid>            (account + nested factures list)
+
+For each mode it reports wall time per request, the DB part (Server-Timing
+"db"), the Python part ("app" - "db") and the body size, and checks that
+both modes return the same data once parsed. The read cache of these routes
+(LIST_CACHE_TTL) is disabled before app2 is imported: every timed request
+builds its body.
+
+Usage examples:
+  python3 bench_json_modes.py --fy 2025
+  python3 bench_json_modes.py --fy 2025 --cid C2025-HABITEK001 --repeat 30
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import time
+from decimal import Decimal
+from datetime import datetime
+
+# Cache hits would measure app_cache, not JSON building
+os.environ["LIST_CACHE_TTL"] = "0"
+
+import app2
+
+MODES = ("python", "db")
+
+
+def _timing(header, name):
+    m = re.search(rf"{name};dur=([0-9.]+)", header or "")
+    return float(m.group(1)) if m else 0.0
+
+
+def _normalize(obj):
+    """Same data regardless of JSON formatting (numeric scale, fractional seconds)."""
+    if isinstance(obj, list):
+        return [_normalize(v) for v in obj]
+    if isinstance(obj, dict):
+        return {k: _normalize(v) for k, v in obj.items()}
+    if isinstance(obj, float):
+        return Decimal(str(obj)).normalize()
+    if isinstance(obj, str) and re.match(r"^\d{4}-\d\d-\d\dT", obj):
+        try:
+            return datetime.fromisoformat(obj)
+        except ValueError:
+            return obj
+    return obj
+
+
+def run(client, url, headers, repeat):
+    results = {}
+    for mode in MODES:
+        sep = "&" if "?" in url else "?"
+        full = f"{url}{sep}json_mode={mode}"
+        client.get(full, headers=headers)  # warm-up (PREPARE)
+        wall, db, app_ms = [], [], []
+        body = b""
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            r = client.get(full, headers=headers)
+            wall.append((time.perf_counter() - t0) * 1000)
+            if r.status_code != 200:
+                raise SystemExit(f"{full} -> HTTP {r.status_code}: {r.data[:200]!r}")
+            st = r.headers.get("Server-Timing")
+            db.append(_timing(st, "db"))
+            app_ms.append(_timing(st, "app") - _timing(st, "db"))
+            body = r.data
+        results[mode] = body
+        print(f"  {mode:<7} wall p50={statistics.median(wall):8.2f}ms  db p50={statistics.median(db):8.2f}ms  "
+              f"python p50={statistics.median(app_ms):8.2f}ms  bytes={len(body)}")
+    same = _normalize(json.loads(results["python"])) == _normalize(json.loads(results["db"]))
+    print(f"  same data: {same}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="json_mode=python vs json_mode=db")
+    ap.add_argument("--fy", type=int, required=True, help="Financial year for GET /api/factures")
+    ap.add_argument("--cid", help="Expense account for GET /api/depense-comptes/<cid>")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    client = app2.app.test_client()
+    headers = {"Authorization": "Bearer " + app2.make_access_token(1, "gestionnaire")}
+
+    print(f"GET /api/factures?fy={args.fy}")
+    run(client, f"/api/factures?fy={args.fy}", headers, args.repeat)
+    if args.cid:
+        print(f"GET /api/depense-comptes/{args.cid}")
+        run(client, f"/api/depense-comptes/{args.cid}", headers, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
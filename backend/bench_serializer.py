@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark: row serialization for list endpoints (no database needed)
+--------------------------------------------------------------------------
+Compares, on N synthetic invoice rows shaped like GET /api/factures:
+  - "legacy": dict(DictRow) + convert_to_json_serializable() on every cell + json.dumps
+             (the path app2.py used before RowSerializer)
+  - "typed":  RowSerializer built once from cursor.description + row_serializer.dumps
+             (orjson when installed, json otherwise)
+
+Usage examples:
+  python3 bench_serializer.py
+  python3 bench_serializer.py --rows 50000 --repeat 5
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, date, timedelta, timezone
+from decimal import Decimal
+
+import row_serializer
+from row_serializer import RowSerializer, OID_NUMERIC, OID_TIMESTAMPTZ
+
+OID_INT4, OID_INT8, OID_TEXT, OID_VARCHAR, OID_INT2 = 23, 20, 25, 1043, 21
+
+# Same columns as the GET /api/factures SELECT: (name, type oid)
+DESCRIPTION = [
+    ("id", OID_INT8), ("fid", OID_TEXT), ("financial_year", OID_INT4),
+    ("date_facture", OID_TIMESTAMPTZ), ("date_soumise", OID_TIMESTAMPTZ),
+    ("date_derniere_modif", OID_TIMESTAMPTZ),
+    ("fournisseur", OID_VARCHAR), ("description", OID_VARCHAR), ("montant", OID_NUMERIC),
+    ("devise", OID_VARCHAR), ("statut", 16390), ("categorie", OID_VARCHAR),
+    ("ligne_budgetaire", OID_VARCHAR), ("type", OID_VARCHAR), ("ubr", OID_VARCHAR),
+    ("poste_budgetaire", OID_VARCHAR), ("uid_soumetteur", OID_VARCHAR),
+    ("uid_approbateur", OID_VARCHAR), ("ref_cdd", OID_TEXT), ("compte_cid", OID_TEXT),
+    ("mode", OID_VARCHAR), ("type_cdd_int", OID_INT2), ("demandeur", OID_TEXT),
+]
+
+
+# ---------------------- Legacy path (as in app2.py before RowSerializer) ----------------------
+def convert_to_json_serializable(obj):
+    if isinstance(obj, (datetime, )):
+        if obj.tzinfo is None:
+            return obj.replace(tzinfo=timezone.utc).isoformat()
+        return obj.isoformat()
+    if isinstance(obj, (date, )):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return obj
+
+class FakeDictRow(list):
+    """Minimal stand-in for psycopg2.extras.DictRow (list + name index)."""
+    __slots__ = ("_index",)
+
+    def __init__(self, values, index):
+        super().__init__(values)
+        self._index = index
+
+    def keys(self):
+        return iter(self._index)
+
+    def items(self):
+        return ((k, list.__getitem__(self, i)) for k, i in self._index.items())
+
+    def __getitem__(self, k):
+        if isinstance(k, str):
+            k = self._index[k]
+        return list.__getitem__(self, k)
+
+def legacy(rows):
+    return json.dumps(
+        [{k: convert_to_json_serializable(v) for k, v in dict(r.items()).items()} for r in rows]
+    ).encode("utf-8")
+
+def typed(rows):
+    return row_serializer.dumps(RowSerializer(DESCRIPTION).rows(rows))
+
+
+# ---------------------- Data ----------------------
+def make_rows(n, seed=42):
+    rnd = random.Random(seed)
+    tz = timezone(timedelta(hours=-4))
+    index = {name: i for i, (name, _) in enumerate(DESCRIPTION)}
+    base = datetime(2024, 5, 1, tzinfo=tz)
+    rows = []
+    for i in range(1, n + 1):
+        d = base + timedelta(minutes=rnd.randint(0, 525600))
+        linked = rnd.random() < 0.3
+        values = [
+            i, f"F2025-{i % 1000:03d}", 2025, d, d, d,
+            f"Fournisseur {rnd.randint(1, 400)}", "Achat de fournitures", Decimal(f"{rnd.uniform(1, 5000):.2f}"),
+            "CAD", rnd.choice(["soumise", "approuvée", "payée"]), "Matériel",
+            "LB-01", "Dépense", "UBR-123", "PB-9", "12", "3",
+            "C2025-HABITEK001" if linked else None, "C2025-HABITEK001" if linked else None,
+            "virement" if linked else None, 0 if linked else None, "Jean Valjean" if linked else None,
+        ]
+        rows.append(FakeDictRow(values, index))
+    return rows
+
+
+def bench(fn, rows, repeat):
+    times = []
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(rows)
+        times.append((time.perf_counter() - t0) * 1000)
+    return times, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Legacy vs typed row serializer")
+    ap.add_argument("--rows", type=int, default=50000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    rows = make_rows(args.rows)
+    print(f"rows={args.rows} repeat={args.repeat} json backend={'orjson' if row_serializer.HAS_ORJSON else 'json'}")
+
+    t_legacy, out_legacy = bench(legacy, rows, args.repeat)
+    t_typed, out_typed = bench(typed, rows, args.repeat)
+
+    same = json.loads(out_legacy) == json.loads(out_typed)
+    print(f"legacy  median={statistics.median(t_legacy):9.1f}ms  min={min(t_legacy):9.1f}ms  bytes={len(out_legacy)}")
+    print(f"typed   median={statistics.median(t_typed):9.1f}ms  min={min(t_typed):9.1f}ms  bytes={len(out_typed)}")
+    print(f"speed-up x{statistics.median(t_legacy) / statistics.median(t_typed):.2f}  identical output: {same}")
+
+
+if __name__ == "__main__":
+    main()
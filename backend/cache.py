@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caches des réponses de lecture coûteuses.
+
+TTLCache : dictionnaire borné (LRU) avec expiration, invalidation par clé et
+compteurs (hits / misses / invalidations), propre au processus. Le verrou vient
+de `threading`, résolu à l'exécution (vert sous eventlet.monkey_patch()).
+Sert au cache des jetons vérifiés et au stockage de LocalCache.
+
+Backends partagés (plusieurs workers gunicorn) : make_cache(url) renvoie un
+LocalCache (en mémoire, un par processus) ou un RedisCache (redis://...).
+Même interface, invalidation par étiquettes (tags) :
+
+    hit, value, stamp = cache.lookup("budget_summary:2025", tags=["budgets:2025"])
+    if not hit:
+        value = charger()
+        cache.store("budget_summary:2025", value, stamp, ttl=300)
+    ...
+    cache.invalidate_tags("budgets:2025")
+
+Chaque étiquette a un numéro de version ; une entrée est stockée avec les
+versions de ses étiquettes lues au lookup (`stamp`) et n'est servie que si
+elles n'ont pas bougé. Invalider = incrémenter : aucune énumération de clés,
+et un chargement commencé avant l'invalidation ne peut pas ressusciter une
+valeur périmée. Les invalidations sont aussi diffusées (publish/subscribe) à
+tous les workers, pour les états qu'ils gardent en local.
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl: float = 300.0, maxsize: int = 256):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()     # clé -> (expire_à, valeur)
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        """(True, valeur) si présente et non expirée, sinon (False, None)."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                self._data.move_to_end(key)
+                self._hits += 1
+                return True, item[1]
+            if item is not None:
+                del self._data[key]
+            self._misses += 1
+            return False, None
+
+    def set(self, key, value, ttl=None):
+        """`ttl` remplace le TTL par défaut pour cette entrée (ex. expiration d'un jeton)."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self._invalidations += 1
+
+    def invalidate_where(self, predicate) -> int:
+        """Retire les entrées pour lesquelles predicate(clé, valeur) est vrai ; renvoie leur nombre."""
+        with self._lock:
+            keys = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+            for key in keys:
+                del self._data[key]
+            self._invalidations += len(keys)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "name": self.name,
+                "ttl": self.ttl,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else None,
+                "invalidations": self._invalidations,
+            }
+
+
+# ----------------------------------------------------------------------
+# Backends à étiquettes : LocalCache (processus) / RedisCache (partagé)
+# ----------------------------------------------------------------------
+def _kind_of(key: str) -> str:
+    """Famille d'une clé pour les compteurs : préfixe avant le premier ':'."""
+    return key.split(":", 1)[0]
+
+
+class _TaggedCacheBase:
+    """Compteurs par famille de clés, horodatage local des invalidations, abonnés."""
+
+    backend = "base"
+    # Horodatages d'invalidation gardés ce temps-là (s) : ils ne servent qu'à des
+    # fenêtres courtes (DB_READ_PIN_SECONDS), inutile de les garder par étiquette à vie.
+    INVALIDATION_MEMORY = 600.0
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._counters = {}           # famille -> {hits, misses, stores}
+        self._errors = 0
+        self._tag_invalidated_at = {}  # étiquette -> time.monotonic() (vue de ce processus)
+        self._handlers = []
+
+    def _count(self, key, field):
+        with self._lock:
+            c = self._counters.setdefault(_kind_of(key), {"hits": 0, "misses": 0, "stores": 0})
+            c[field] += 1
+
+    def _error(self, what, e):
+        with self._lock:
+            self._errors += 1
+        log.warning("cache %s (%s): %s", what, self.backend, e)
+
+    def _mark_invalidated(self, tags):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._tag_invalidated_at) > 1024:
+                horizon = now - self.INVALIDATION_MEMORY
+                self._tag_invalidated_at = {t: at for t, at in self._tag_invalidated_at.items() if at > horizon}
+            for t in tags:
+                self._tag_invalidated_at[t] = now
+
+    def invalidated_since(self, tag) -> float:
+        """Secondes depuis la dernière invalidation connue de `tag` (inf si jamais)."""
+        with self._lock:
+            t = self._tag_invalidated_at.get(tag)
+        return float("inf") if t is None else time.monotonic() - t
+
+    def subscribe(self, handler):
+        """handler(event: dict) reçoit chaque événement publié, dans chaque worker."""
+        self._handlers.append(handler)
+
+    def _dispatch(self, event):
+        if event.get("type") == "invalidate":
+            self._mark_invalidated(event.get("tags") or [])
+        for h in list(self._handlers):
+            try:
+                h(event)
+            except Exception as e:
+                self._error("handler", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            kinds = {}
+            for kind, c in self._counters.items():
+                lookups = c["hits"] + c["misses"]
+                kinds[kind] = dict(c, hit_ratio=round(c["hits"] / lookups, 3) if lookups else None)
+            return {"backend": self.backend, "namespace": self.namespace,
+                    "errors": self._errors, "kinds": kinds}
+
+
+class LocalCache(_TaggedCacheBase):
+    """
+    Backend en mémoire du processus (un cache par worker).
+
+    Versions d'étiquettes tirées d'un compteur global (jamais réutilisées) : une
+    étiquette oubliée repart à 0, qu'aucune entrée encore vivante ne peut porter
+    si sa dernière invalidation date de plus que le plus long TTL stocké. Au-delà
+    de `max_tags` étiquettes, celles-là sont élaguées (cdd:<cid> est illimité).
+    """
+
+    backend = "local"
+
+    def __init__(self, namespace: str = "app", maxsize: int = 1024, default_ttl: float = 300.0,
+                 max_tags: int = 4096):
+        super().__init__(namespace)
+        self._entries = TTLCache(namespace, ttl=default_ttl, maxsize=maxsize)
+        self._versions = {}   # étiquette -> (version, time.monotonic() de l'invalidation)
+        self._clock = 0
+        self._max_ttl = default_ttl
+        self._pruned_at = 0.0
+        self.max_tags = max_tags
+
+    def lookup(self, key, tags=()):
+        with self._lock:
+            stamp = tuple(self._versions.get(t, (0,))[0] for t in tags)
+        hit, entry = self._entries.get(key)
+        if hit and entry[0] == stamp:
+            self._count(key, "hits")
+            return True, entry[1], stamp
+        self._count(key, "misses")
+        return False, None, stamp
+
+    def store(self, key, value, stamp, ttl=None):
+        if ttl is not None and ttl > self._max_ttl:
+            with self._lock:
+                self._max_ttl = max(self._max_ttl, ttl)
+        self._entries.set(key, (stamp, value), ttl=ttl)
+        self._count(key, "stores")
+
+    def delete(self, *keys):
+        self._entries.invalidate(*keys)
+
+    def invalidate_tags(self, *tags):
+        tags = sorted(set(tags))
+        now = time.monotonic()
+        with self._lock:
+            # Au plus une passe par seconde si toutes les étiquettes sont récentes
+            if len(self._versions) >= self.max_tags and now - self._pruned_at >= 1.0:
+                self._pruned_at = now
+                horizon = now - self._max_ttl
+                self._versions = {t: v for t, v in self._versions.items() if v[1] > horizon}
+            for t in tags:
+                self._clock += 1
+                self._versions[t] = (self._clock, now)
+        self._dispatch({"type": "invalidate", "tags": tags})
+
+    def publish(self, event: dict):
+        self._dispatch(event)
+
+    def stats(self) -> dict:
+        out = super().stats()
+        st = self._entries.stats()
+        with self._lock:
+            tags = len(self._versions)
+        out.update(size=st["size"], maxsize=st["maxsize"], tags=tags)
+        return out
+
+
+def _encode_entry(stamp, value) -> bytes:
+    """
+    En-tête JSON {"s": stamp, "t": type}, saut de ligne, puis le corps : octets
+    tels quels (b), texte UTF-8 (s) ou JSON (j). Pas de pickle : un contenu
+    écrit dans Redis ne peut pas exécuter de code dans les workers.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        kind, body = "b", bytes(value)
+    elif isinstance(value, str):
+        kind, body = "s", value.encode("utf-8")
+    else:
+        kind, body = "j", json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return json.dumps({"s": list(stamp), "t": kind}).encode("ascii") + b"\n" + body
+
+def _decode_entry(blob):
+    """(stamp, valeur) ; ValueError si l'entrée est illisible."""
+    head, sep, body = bytes(blob).partition(b"\n")
+    if not sep:
+        raise ValueError("entrée de cache sans en-tête")
+    meta = json.loads(head)
+    kind = meta["t"]
+    if kind == "b":
+        value = body
+    elif kind == "s":
+        value = body.decode("utf-8")
+    elif kind == "j":
+        value = json.loads(body)
+    else:
+        raise ValueError(f"type d'entrée inconnu: {kind!r}")
+    return tuple(int(v) for v in meta["s"]), value
+
+
+class RedisCache(_TaggedCacheBase):
+    """
+    Backend partagé (Redis ou compatible). Clés préfixées par l'espace de noms :
+      <ns>:v:<clé>    valeur (en-tête JSON + corps, voir _encode_entry), expiration PX
+      <ns>:t:<tag>    version de l'étiquette (INCR)
+      <ns>:events     canal pub/sub des invalidations et autres événements
+    lookup() = un aller-retour (MGET des versions + GET en pipeline).
+    Une panne Redis dégrade en « pas de cache » (miss, écriture ignorée).
+    """
+
+    backend = "redis"
+    TAG_TTL_MIN = 7 * 24 * 3600   # versions d'étiquettes gardées bien au-delà des valeurs
+
+    def __init__(self, url: str, namespace: str = "app", default_ttl: float = 300.0, client=None):
+        super().__init__(namespace)
+        if client is None:
+            import redis   # dépendance optionnelle, seulement si CACHE_URL=redis://...
+            client = redis.Redis.from_url(url)
+        self._r = client
+        self.default_ttl = default_ttl
+        self._tag_ttl = int(max(self.TAG_TTL_MIN, 10 * default_ttl))
+        self._channel = f"{namespace}:events"
+        self._listener = None
+
+    def _vkey(self, key):
+        return f"{self.namespace}:v:{key}"
+
+    def _tkey(self, tag):
+        return f"{self.namespace}:t:{tag}"
+
+    def lookup(self, key, tags=()):
+        tags = list(tags)
+        try:
+            pipe = self._r.pipeline(transaction=False)
+            if tags:
+                pipe.mget([self._tkey(t) for t in tags])
+            pipe.get(self._vkey(key))
+            res = pipe.execute()
+        except Exception as e:
+            self._error("lookup", e)
+            self._count(key, "misses")
+            return False, None, None
+        versions, blob = (res[0], res[1]) if tags else ([], res[0])
+        stamp = tuple(int(v or 0) for v in versions)
+        if blob is not None:
+            try:
+                stored_stamp, value = _decode_entry(blob)
+            except Exception as e:
+                self._error("decode", e)
+            else:
+                if stored_stamp == stamp:
+                    self._count(key, "hits")
+                    return True, value, stamp
+        self._count(key, "misses")
+        return False, None, stamp
+
+    def store(self, key, value, stamp, ttl=None):
+        if stamp is None:   # lookup en erreur : versions inconnues
+            return
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            self._r.set(self._vkey(key), _encode_entry(stamp, value), px=max(1, int(ttl * 1000)))
+            self._count(key, "stores")
+        except Exception as e:
+            self._error("store", e)
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        try:
+            self._r.delete(*[self._vkey(k) for k in keys])
+        except Exception as e:
+            self._error("delete", e)
+
+    def invalidate_tags(self, *tags):
+        tags = sorted(set(tags))
+        if not tags:
+            return
+        self._mark_invalidated(tags)
+        try:
+            pipe = self._r.pipeline(transaction=False)
+            for t in tags:
+                pipe.incr(self._tkey(t))
+                pipe.expire(self._tkey(t), self._tag_ttl)
+            pipe.execute()
+        except Exception as e:
+            self._error("invalidate", e)
+        self.publish({"type": "invalidate", "tags": tags})
+
+    def publish(self, event: dict):
+        """Diffuse à tous les workers abonnés (y compris celui-ci, via l'écouteur)."""
+        try:
+            self._r.publish(self._channel, json.dumps(event))
+        except Exception as e:
+            self._error("publish", e)
+            self._dispatch(event)   # au moins ce processus
+
+    def subscribe(self, handler):
+        super().subscribe(handler)
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, name="cache-events", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._r.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                for msg in pubsub.listen():
+                    if msg.get("type") != "message":
+                        continue
+                    try:
+                        event = json.loads(msg["data"])
+                    except Exception as e:
+                        self._error("event", e)
+                        continue
+                    self._dispatch(event)
+            except Exception as e:
+                self._error("listen", e)
+                time.sleep(1.0)
+
+    def stats(self) -> dict:
+        out = super().stats()
+        out["listening"] = self._listener is not None and self._listener.is_alive()
+        return out
+
+
+def make_cache(url: str = "", namespace: str = "app", default_ttl: float = 300.0, maxsize: int = 1024):
+    """'' / 'local' -> LocalCache ; redis://, rediss://, unix:// -> RedisCache."""
+    url = (url or "").strip()
+    if not url or url == "local":
+        return LocalCache(namespace, maxsize=maxsize, default_ttl=default_ttl)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url, namespace, default_ttl=default_ttl)
+    raise ValueError(f"CACHE_URL non supportée: {url!r}")
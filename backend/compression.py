@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compression négociée des réponses JSON / CSV (gzip, brotli si installé).
+
+ResponseCompressor.apply() s'appelle depuis un after_request :
+  - encodage choisi selon Accept-Encoding (qualités q=) : br > gzip ;
+  - seuls les types listés (application/json, text/csv) sont concernés, et
+    `Vary: Accept-Encoding` est posé dès que le type est compressible ;
+  - corps en mémoire : compressé d'un bloc s'il dépasse `min_size`. Au-delà
+    de `offload_size`, la compression passe par `offload` (CpuOffload.run :
+    zlib et brotli relâchent le GIL, le hub eventlet reste libre) ;
+  - réponses en flux (stream_with_context) : compresseur incrémental, vidé
+    (sync flush) dès que `stream_flush_size` octets se sont accumulés depuis
+    le dernier vidage — vider chaque petit lot grossirait le flux au lieu de
+    le réduire ; la taille n'étant pas connue d'avance, pas de seuil ;
+  - ignorés : 1xx/204/206/304, Content-Encoding déjà posé, direct_passthrough
+    (send_file), Cache-Control: no-transform, requêtes HEAD.
+
+stats() : par route, réponses vues / compressées, octets avant / après et
+octets économisés (les flux sont comptés à la fin de l'envoi, comme
+compressés seulement s'ils ont effectivement rétréci).
+
+Brotli est optionnel (`pip install Brotli`) ; sans lui, gzip seulement.
+"""
+
+import threading
+import zlib
+
+try:
+    import brotli
+except Exception:
+    try:
+        import brotlicffi as brotli
+    except Exception:
+        brotli = None
+
+HAS_BROTLI = brotli is not None
+
+COMPRESSIBLE_MIMETYPES = frozenset({"application/json", "text/csv"})
+
+
+class _StreamEncoder:
+    """
+    Compresseur incrémental : feed(bytes) -> octets déjà produits (souvent
+    vide), flush() -> vidage synchronisé, finish() -> fin du flux.
+    """
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=level)
+        else:
+            self._c = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = en-tête gzip
+
+    def feed(self, data):
+        if self.encoding == "br":
+            return self._c.process(data)
+        return self._c.compress(data)
+
+    def flush(self):
+        if self.encoding == "br":
+            return self._c.flush()
+        return self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self._c.finish()
+        return self._c.flush(zlib.Z_FINISH)
+
+
+class ResponseCompressor:
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=4,
+                 mimetypes=COMPRESSIBLE_MIMETYPES, offload=None, offload_size=256 * 1024,
+                 stream_flush_size=16 * 1024):
+        self.min_size = max(0, int(min_size))
+        self.gzip_level = int(gzip_level)
+        self.brotli_quality = int(brotli_quality)
+        self.mimetypes = frozenset(mimetypes)
+        self.offload = offload
+        self.offload_size = int(offload_size)
+        self.stream_flush_size = max(1, int(stream_flush_size))
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    # ---------------------- Négociation ----------------------
+    def choose(self, accept_encodings):
+        """Meilleur encodage accepté (werkzeug MIMEAccept/Accept de request.accept_encodings)."""
+        candidates = (["br"] if HAS_BROTLI else []) + ["gzip"]
+        best, best_q = None, 0
+        for enc in candidates:
+            q = accept_encodings[enc]  # 0 si absent ou q=0 ; '*' pris en compte
+            if q > best_q:
+                best, best_q = enc, q
+        return best
+
+    def _level(self, encoding):
+        return self.brotli_quality if encoding == "br" else self.gzip_level
+
+    def _compress(self, encoding, data):
+        if encoding == "br":
+            return brotli.compress(data, quality=self.brotli_quality)
+        c = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return c.compress(data) + c.flush()
+
+    # ---------------------- after_request ----------------------
+    def apply(self, response, accept_encodings, route_key, method="GET"):
+        if response.mimetype not in self.mimetypes:
+            return response
+        response.vary.add("Accept-Encoding")
+        if (method == "HEAD"
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or "Content-Encoding" in response.headers
+                or response.direct_passthrough
+                or "no-transform" in (response.headers.get("Cache-Control") or "")):
+            return response
+        encoding = self.choose(accept_encodings)
+
+        if response.is_streamed:
+            self._count(route_key, 0, 0, compressed=False, seen=True)
+            if encoding is None:
+                return response
+            response.response = self._stream(response.response, encoding, route_key)
+            response.headers["Content-Encoding"] = encoding
+            response.headers.pop("Content-Length", None)
+            self._weaken_etag(response)
+            return response
+
+        data = response.get_data()
+        if encoding is None or len(data) < self.min_size:
+            self._count(route_key, len(data), len(data), compressed=False, seen=True)
+            return response
+        if self.offload is not None and len(data) >= self.offload_size:
+            body = self.offload(self._compress, encoding, data)
+        else:
+            body = self._compress(encoding, data)
+        if len(body) >= len(data):
+            self._count(route_key, len(data), len(data), compressed=False, seen=True)
+            return response
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        self._weaken_etag(response)
+        self._count(route_key, len(data), len(body), compressed=True, seen=True)
+        return response
+
+    @staticmethod
+    def _weaken_etag(response):
+        # Un ETag fort désigne une suite d'octets précise : il change avec l'encodage.
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+    def _stream(self, chunks, encoding, route_key):
+        enc = _StreamEncoder(encoding, self._level(encoding))
+        raw = out = pending = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                if not chunk:
+                    continue
+                raw += len(chunk)
+                pending += len(chunk)
+                piece = enc.feed(chunk)
+                if pending >= self.stream_flush_size:
+                    piece += enc.flush()
+                    pending = 0
+                if piece:
+                    out += len(piece)
+                    yield piece
+            tail = enc.finish()
+            out += len(tail)
+            yield tail
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            self._count(route_key, raw, out, compressed=out < raw, seen=False)
+
+    # ---------------------- Compteurs ----------------------
+    def _count(self, route_key, bytes_in, bytes_out, compressed, seen):
+        with self._lock:
+            m = self._routes.get(route_key)
+            if m is None:
+                m = self._routes[route_key] = {
+                    "responses": 0, "compressed": 0, "bytes_in": 0, "bytes_out": 0,
+                }
+            if seen:
+                m["responses"] += 1
+            if compressed:
+                m["compressed"] += 1
+            m["bytes_in"] += bytes_in
+            m["bytes_out"] += bytes_out
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {
+                key: dict(
+                    m,
+                    bytes_saved=m["bytes_in"] - m["bytes_out"],
+                    ratio=round(m["bytes_out"] / m["bytes_in"], 3) if m["bytes_in"] else None,
+                )
+                for key, m in self._routes.items()
+            }
+        return {
+            "encodings": (["br"] if HAS_BROTLI else []) + ["gzip"],
+            "min_size": self.min_size,
+            "bytes_saved": sum(m["bytes_saved"] for m in routes.values()),
+            "routes": routes,
+        }
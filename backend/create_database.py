@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import hashlib
 import psycopg2
 from psycopg2 import sql
 from urllib.parse import urlparse, unquote
@@ -244,6 +245,12 @@ CREATE TABLE IF NOT EXISTS cdd_pj (
 );
 """,
 
+# Empreinte + taille des pièces jointes (ETag fort, 304 sans lecture disque)
+"ALTER TABLE factures_pj ADD COLUMN IF NOT EXISTS content_sha256 text;",
+"ALTER TABLE factures_pj ADD COLUMN IF NOT EXISTS file_size bigint;",
+"ALTER TABLE cdd_pj ADD COLUMN IF NOT EXISTS content_sha256 text;",
+"ALTER TABLE cdd_pj ADD COLUMN IF NOT EXISTS file_size bigint;",
+
 # =========================
 # Index utiles
 # =========================
@@ -251,6 +258,12 @@ CREATE TABLE IF NOT EXISTS cdd_pj (
 "CREATE INDEX IF NOT EXISTS idx_compte_depenses_cid ON compte_depenses(cid);",
 "CREATE INDEX IF NOT EXISTS idx_factures_finyr ON factures(financial_year);",
 "CREATE INDEX IF NOT EXISTS idx_cdd_finyr ON compte_depenses(financial_year);",
+# Pagination par curseur de GET /api/factures : un index par clé de tri, puis id.
+# Expressions identiques à FACTURES_SORT_KEYS (app2.py) pour montant et fid.
+"CREATE INDEX IF NOT EXISTS idx_factures_fy_date_id ON factures(financial_year, date_facture DESC, id DESC);",
+"CREATE INDEX IF NOT EXISTS idx_factures_fy_fournisseur_id ON factures(financial_year, fournisseur, id);",
+"CREATE INDEX IF NOT EXISTS idx_factures_fy_montant_id ON factures(financial_year, (COALESCE(montant, 0)), id);",
+"CREATE INDEX IF NOT EXISTS idx_factures_fy_fid_id ON factures(financial_year, (COALESCE(fid, '')), id);",
 
 # =========================
 # Métadonnées : compteurs d'ID
@@ -406,7 +419,238 @@ END;
 $$;
 """,
 "DROP TRIGGER IF EXISTS t_cdd_biu ON compte_depenses;",
-"CREATE TRIGGER t_cdd_biu BEFORE INSERT OR UPDATE ON compte_depenses FOR EACH ROW EXECUTE FUNCTION trg_cdd_biu();"
+"CREATE TRIGGER t_cdd_biu BEFORE INSERT OR UPDATE ON compte_depenses FOR EACH ROW EXECUTE FUNCTION trg_cdd_biu();",
+
+# =========================
+# Versions de données (validateurs ETag des GET de liste)
+# =========================
+# Une ligne par (table, année financière) ; 0 = année inconnue (NULL).
+# version est incrémentée à chaque écriture, changed_at garde l'instant : l'ETag
+# ne peut pas retomber sur une ancienne valeur si la table est recréée.
+"""
+CREATE TABLE IF NOT EXISTS data_versions (
+  table_name     text    NOT NULL,
+  financial_year integer NOT NULL,
+  version        bigint  NOT NULL DEFAULT 1,
+  changed_at     timestamptz NOT NULL DEFAULT clock_timestamp(),
+  PRIMARY KEY (table_name, financial_year)
+);
+""",
+
+"""
+CREATE OR REPLACE FUNCTION bump_data_version(p_table text, p_year integer)
+RETURNS void
+LANGUAGE sql
+AS $$
+  INSERT INTO data_versions(table_name, financial_year)
+  VALUES (p_table, COALESCE(p_year, 0))
+  ON CONFLICT (table_name, financial_year)
+  DO UPDATE SET version = data_versions.version + 1, changed_at = clock_timestamp();
+$$;
+""",
+
+# Générique : financial_year est integer (factures, compte_depenses) ou varchar(4) (budgets).
+# Par instruction, avec tables de transition : un UPDATE de masse incrémente chaque
+# année touchée une fois au lieu de réécrire la même ligne de data_versions par ligne.
+"""
+CREATE OR REPLACE FUNCTION trg_data_version()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_years text[];
+  v_year int;
+BEGIN
+  -- Seule la branche exécutée est préparée : chaque trigger ne déclare que ses tables
+  IF TG_OP = 'INSERT' THEN
+    SELECT array_agg(DISTINCT to_jsonb(n)->>'financial_year') INTO v_years FROM new_rows n;
+  ELSIF TG_OP = 'UPDATE' THEN
+    -- Ligne déplacée d'une année à l'autre : l'ancienne année change aussi
+    SELECT array_agg(DISTINCT fy) INTO v_years FROM (
+      SELECT to_jsonb(n)->>'financial_year' FROM new_rows n
+      UNION ALL
+      SELECT to_jsonb(o)->>'financial_year' FROM old_rows o
+    ) s(fy);
+  ELSE
+    SELECT array_agg(DISTINCT to_jsonb(o)->>'financial_year') INTO v_years FROM old_rows o;
+  END IF;
+  -- Ordre fixe : deux instructions concurrentes verrouillent les lignes dans le même ordre
+  FOR v_year IN
+    SELECT DISTINCT COALESCE(NULLIF(fy, '')::int, 0) FROM unnest(v_years) AS fy ORDER BY 1
+  LOOP
+    PERFORM bump_data_version(TG_TABLE_NAME, v_year);
+  END LOOP;
+  RETURN NULL;
+END;
+$$;
+""",
+# Les tables de transition imposent un trigger par événement
+*[stmt
+  for table, prefix in (("factures", "t_factures"), ("compte_depenses", "t_cdd"), ("budgets", "t_budgets"))
+  for stmt in (
+      f"DROP TRIGGER IF EXISTS {prefix}_version ON {table};",
+      f"DROP TRIGGER IF EXISTS {prefix}_version_ins ON {table};",
+      f"CREATE TRIGGER {prefix}_version_ins AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows "
+      f"FOR EACH STATEMENT EXECUTE FUNCTION trg_data_version();",
+      f"DROP TRIGGER IF EXISTS {prefix}_version_upd ON {table};",
+      f"CREATE TRIGGER {prefix}_version_upd AFTER UPDATE ON {table} "
+      f"REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+      f"FOR EACH STATEMENT EXECUTE FUNCTION trg_data_version();",
+      f"DROP TRIGGER IF EXISTS {prefix}_version_del ON {table};",
+      f"CREATE TRIGGER {prefix}_version_del AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows "
+      f"FOR EACH STATEMENT EXECUTE FUNCTION trg_data_version();",
+  )],
+
+# =========================
+# Agrégats factures par (année, statut, catégorie, ubr, devise)
+# =========================
+# Maintenus par trigger : les totaux des tableaux de bord se lisent en O(groupes)
+# au lieu de parcourir factures. NULL est stocké '' (colonnes de clé primaire).
+"""
+CREATE TABLE IF NOT EXISTS factures_aggregates (
+  financial_year integer NOT NULL,
+  statut         text    NOT NULL DEFAULT '',
+  catégorie      text    NOT NULL DEFAULT '',
+  ubr            text    NOT NULL DEFAULT '',
+  devise         text    NOT NULL DEFAULT '',
+  nb             bigint  NOT NULL DEFAULT 0,
+  montant_total  numeric NOT NULL DEFAULT 0,
+  PRIMARY KEY (financial_year, statut, catégorie, ubr, devise)
+);
+""",
+
+"""
+CREATE OR REPLACE FUNCTION factures_agg_apply(
+  p_year int, p_statut text, p_categorie text, p_ubr text, p_devise text,
+  p_nb int, p_montant numeric)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  INSERT INTO factures_aggregates AS a (financial_year, statut, catégorie, ubr, devise, nb, montant_total)
+  VALUES (COALESCE(p_year, 0), COALESCE(p_statut, ''), COALESCE(p_categorie, ''),
+          COALESCE(p_ubr, ''), COALESCE(p_devise, ''), p_nb, COALESCE(p_montant, 0))
+  ON CONFLICT (financial_year, statut, catégorie, ubr, devise)
+  DO UPDATE SET nb = a.nb + EXCLUDED.nb, montant_total = a.montant_total + EXCLUDED.montant_total;
+  -- Groupe vidé : on le retire (la lecture reste en O(groupes non vides))
+  DELETE FROM factures_aggregates
+   WHERE financial_year = COALESCE(p_year, 0) AND statut = COALESCE(p_statut, '')
+     AND catégorie = COALESCE(p_categorie, '') AND ubr = COALESCE(p_ubr, '')
+     AND devise = COALESCE(p_devise, '') AND nb <= 0;
+END;
+$$;
+""",
+
+"""
+CREATE OR REPLACE FUNCTION trg_factures_agg()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  k_old text[];
+  k_new text[];
+BEGIN
+  IF TG_OP <> 'INSERT' THEN
+    k_old := ARRAY[OLD.financial_year::text, OLD.statut::text, OLD.catégorie, OLD.ubr, OLD.devise::text];
+  END IF;
+  IF TG_OP <> 'DELETE' THEN
+    k_new := ARRAY[NEW.financial_year::text, NEW.statut::text, NEW.catégorie, NEW.ubr, NEW.devise::text];
+  END IF;
+  -- Modification sans effet sur les agrégats (description, pièces, approbateur...)
+  IF TG_OP = 'UPDATE' AND k_old IS NOT DISTINCT FROM k_new
+     AND OLD.montant IS NOT DISTINCT FROM NEW.montant THEN
+    RETURN NULL;
+  END IF;
+  -- Deux groupes touchés (changement d'année, de statut...) : toujours dans le même
+  -- ordre, pour que deux déplacements croisés concurrents ne s'interbloquent pas.
+  IF TG_OP = 'UPDATE' AND k_new::text < k_old::text THEN
+    PERFORM factures_agg_apply(NEW.financial_year, NEW.statut::text, NEW.catégorie, NEW.ubr, NEW.devise::text, 1, NEW.montant);
+    PERFORM factures_agg_apply(OLD.financial_year, OLD.statut::text, OLD.catégorie, OLD.ubr, OLD.devise::text, -1, -OLD.montant);
+    RETURN NULL;
+  END IF;
+  IF TG_OP <> 'INSERT' THEN
+    PERFORM factures_agg_apply(OLD.financial_year, OLD.statut::text, OLD.catégorie, OLD.ubr, OLD.devise::text, -1, -OLD.montant);
+  END IF;
+  IF TG_OP <> 'DELETE' THEN
+    PERFORM factures_agg_apply(NEW.financial_year, NEW.statut::text, NEW.catégorie, NEW.ubr, NEW.devise::text, 1, NEW.montant);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+""",
+
+# Reconstruction complète (aussi appelable à la main : SELECT rebuild_factures_aggregates();).
+# Le verrou SHARE sur factures bloque les écritures le temps du recalcul.
+"""
+CREATE OR REPLACE FUNCTION rebuild_factures_aggregates()
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  LOCK TABLE factures IN SHARE MODE;
+  DELETE FROM factures_aggregates;
+  INSERT INTO factures_aggregates (financial_year, statut, catégorie, ubr, devise, nb, montant_total)
+  SELECT COALESCE(financial_year, 0), COALESCE(statut::text, ''), COALESCE(catégorie, ''),
+         COALESCE(ubr, ''), COALESCE(devise::text, ''), count(*), COALESCE(sum(montant), 0)
+    FROM factures
+   GROUP BY 1, 2, 3, 4, 5;
+END;
+$$;
+""",
+"DROP TRIGGER IF EXISTS t_factures_agg ON factures;",
+"CREATE TRIGGER t_factures_agg AFTER INSERT OR UPDATE OR DELETE ON factures FOR EACH ROW EXECUTE FUNCTION trg_factures_agg();",
+"SELECT rebuild_factures_aggregates();",
+
+# Boîte d'envoi des événements temps réel : écrits dans la transaction de la
+# modification, relayés après commit par chaque worker (backend/outbox.py).
+# txid : transaction d'origine ; le relais lit par intervalle de txid terminés.
+"""
+CREATE TABLE IF NOT EXISTS event_outbox (
+  id         bigserial PRIMARY KEY,
+  txid       bigint NOT NULL DEFAULT txid_current(),
+  created_at timestamptz NOT NULL DEFAULT now(),
+  event      text NOT NULL,
+  rooms      text[] NOT NULL,
+  payload    jsonb NOT NULL
+);
+""",
+"CREATE INDEX IF NOT EXISTS idx_event_outbox_txid ON event_outbox(txid, id);",
+"CREATE INDEX IF NOT EXISTS idx_event_outbox_created ON event_outbox(created_at);",
+# Une notification par instruction ; NOTIFY n'est délivré qu'au commit (et fusionné
+# s'il est répété dans la même transaction).
+"""
+CREATE OR REPLACE FUNCTION trg_event_outbox_notify()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  PERFORM pg_notify('event_outbox', '');
+  RETURN NULL;
+END;
+$$;
+""",
+"DROP TRIGGER IF EXISTS t_event_outbox_notify ON event_outbox;",
+"CREATE TRIGGER t_event_outbox_notify AFTER INSERT ON event_outbox FOR EACH STATEMENT EXECUTE FUNCTION trg_event_outbox_notify();",
+
+# Version de ligne : +1 à chaque UPDATE (portée par les événements *.updated et les
+# lectures ; un client ignore un événement dont row_version <= celle qu'il connaît).
+"ALTER TABLE factures ADD COLUMN IF NOT EXISTS row_version bigint NOT NULL DEFAULT 1;",
+"ALTER TABLE compte_depenses ADD COLUMN IF NOT EXISTS row_version bigint NOT NULL DEFAULT 1;",
+"""
+CREATE OR REPLACE FUNCTION trg_bump_row_version()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  NEW.row_version := OLD.row_version + 1;
+  RETURN NEW;
+END;
+$$;
+""",
+"DROP TRIGGER IF EXISTS t_factures_row_version ON factures;",
+"CREATE TRIGGER t_factures_row_version BEFORE UPDATE ON factures FOR EACH ROW EXECUTE FUNCTION trg_bump_row_version();",
+"DROP TRIGGER IF EXISTS t_cdd_row_version ON compte_depenses;",
+"CREATE TRIGGER t_cdd_row_version BEFORE UPDATE ON compte_depenses FOR EACH ROW EXECUTE FUNCTION trg_bump_row_version();"
 ]
 
 # --------------------------------------------------------------------
@@ -452,6 +696,40 @@ def apply_schema():
     finally:
         conn.close()
 
+def backfill_piece_hashes():
+    """
+    Calcule content_sha256 / file_size des pièces jointes enregistrées avant
+    l'ajout de ces colonnes (fichiers absents du disque : ignorés).
+    """
+    conn = connect_db(pg_db)
+    conn.autocommit = False
+    done = 0
+    try:
+        with conn.cursor() as cur:
+            for table, key in (("factures_pj", "invoice_pk"), ("cdd_pj", "expense_pk")):
+                cur.execute(f"SELECT {key}, file_index, file_path FROM {table} WHERE content_sha256 IS NULL")
+                for pk, idx, path in cur.fetchall():
+                    if not path or not os.path.isfile(path):
+                        continue
+                    h = hashlib.sha256()
+                    with open(path, "rb") as f:
+                        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                            h.update(chunk)
+                    cur.execute(
+                        f"UPDATE {table} SET content_sha256=%s, file_size=%s WHERE {key}=%s AND file_index=%s",
+                        (h.hexdigest(), os.path.getsize(path), pk, idx),
+                    )
+                    done += 1
+        conn.commit()
+        if done:
+            print(f"✅ Empreintes calculées pour {done} pièce(s) jointe(s).")
+    except Exception as e:
+        conn.rollback()
+        print("❌ Erreur calcul des empreintes de pièces jointes :", e)
+        raise
+    finally:
+        conn.close()
+
 # --------------------------------------------------------------------
 # 4) Seed: créer un compte admin (gestionnaire) mot de passe 'admin'
 # --------------------------------------------------------------------
@@ -520,5 +798,6 @@ if __name__ == "__main__":
         print("ℹ️ Création de base ignorée (pas de droit CREATEDB ?):", e)
 
     apply_schema()
+    backfill_piece_hashes()
     # Seed admin (idempotent)
     seed_admin_user()
@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pool de connexions PostgreSQL borné, compatible eventlet.
+
+Les primitives de synchronisation viennent de `threading`, résolu à l'exécution :
+sous `eventlet.monkey_patch()` ce sont des primitives vertes (un greenlet qui
+attend une connexion cède le hub), sinon de vrais verrous de threads.
+
+Usage :
+    pool = ConnectionPool(DATABASE_URL, minconn=1, maxconn=10)
+    conn = pool.getconn()      # PooledConnection (API psycopg2)
+    ...
+    conn.close()               # rend la connexion au pool (ne la ferme pas)
+
+psycopg2 est une extension C : sans callback d'attente, une requête bloque tout
+le hub eventlet. make_psycopg_green() installe un callback qui rend la main au
+hub pendant les attentes réseau (même approche que psycogreen).
+
+PreparedStatements : registre de requêtes nommées, préparées (PREPARE) une
+seule fois par connexion puis exécutées par nom (EXECUTE).
+"""
+
+import re
+import time
+import threading
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+
+# ----------------------------------------------------------------------
+# E/S coopératives (eventlet)
+# ----------------------------------------------------------------------
+def eventlet_wait_callback(conn, timeout=-1):
+    """Callback d'attente psycopg2 : attend la socket via le hub eventlet."""
+    from eventlet.hubs import trampoline
+    while True:
+        state = conn.poll()
+        if state == psycopg2.extensions.POLL_OK:
+            break
+        elif state == psycopg2.extensions.POLL_READ:
+            trampoline(conn.fileno(), read=True)
+        elif state == psycopg2.extensions.POLL_WRITE:
+            trampoline(conn.fileno(), write=True)
+        else:
+            raise psycopg2.OperationalError(f"Résultat de poll() inattendu: {state!r}")
+
+
+def make_psycopg_green():
+    """Active les E/S coopératives pour toutes les connexions psycopg2 du processus."""
+    psycopg2.extensions.set_wait_callback(eventlet_wait_callback)
+
+
+def make_psycopg_blocking():
+    psycopg2.extensions.set_wait_callback(None)
+
+
+def is_psycopg_green() -> bool:
+    return psycopg2.extensions.get_wait_callback() is not None
+
+
+class PoolError(Exception):
+    """Erreur générique du pool (pool fermé, etc.)."""
+
+
+class PoolTimeout(PoolError):
+    """Aucune connexion disponible dans le délai d'attente."""
+
+
+class TimedCursor:
+    """
+    Enveloppe fine d'un curseur psycopg2 : chronomètre execute*/callproc (et les
+    fetch* des curseurs nommés, dont le temps est passé côté serveur) et les
+    signale à observer(kind, sql, secondes), kind valant "execute" ou "fetch".
+    """
+
+    def __init__(self, cur, observer):
+        object.__setattr__(self, "_cur", cur)
+        object.__setattr__(self, "_observer", observer)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cur, name, value)
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cur.close()
+        return False
+
+    def _timed(self, kind, sql, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._observer(kind, sql, time.perf_counter() - t0)
+
+    def execute(self, query, vars=None):
+        return self._timed("execute", query, self._cur.execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._timed("execute", query, self._cur.executemany, query, vars_list)
+
+    def callproc(self, procname, parameters=None):
+        return self._timed("execute", procname, self._cur.callproc, procname, parameters)
+
+    def fetchone(self):
+        if self._cur.name is None:
+            return self._cur.fetchone()
+        return self._timed("fetch", self._cur.query, self._cur.fetchone)
+
+    def fetchmany(self, size=None):
+        if self._cur.name is None:
+            return self._cur.fetchmany(size) if size is not None else self._cur.fetchmany()
+        if size is None:
+            return self._timed("fetch", self._cur.query, self._cur.fetchmany)
+        return self._timed("fetch", self._cur.query, self._cur.fetchmany, size)
+
+    def fetchall(self):
+        if self._cur.name is None:
+            return self._cur.fetchall()
+        return self._timed("fetch", self._cur.query, self._cur.fetchall)
+
+
+class PooledConnection:
+    """
+    Enveloppe une connexion psycopg2. Tous les attributs sont délégués à la
+    connexion réelle, sauf close() qui rend la connexion au pool. Si le pool a
+    un query_observer, cursor() renvoie des TimedCursor.
+    """
+
+    _own = ("_pool", "_raw", "created_at", "last_used")
+
+    def __init__(self, pool, raw):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_raw", raw)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        if name in self._own:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._raw, name, value)
+
+    def cursor(self, *args, **kwargs):
+        cur = self._raw.cursor(*args, **kwargs)
+        observer = self._pool.query_observer
+        return TimedCursor(cur, observer) if observer else cur
+
+    @property
+    def raw(self):
+        return self._raw
+
+    @property
+    def pool(self):
+        return self._pool
+
+    def close(self):
+        self._pool.putconn(self)
+
+    def __repr__(self):
+        return f"<PooledConnection pool={self._pool.name!r} closed={self._raw.closed}>"
+
+
+class ConnectionPool:
+    """
+    Pool borné [minconn, maxconn] :
+      - attente bornée (timeout) quand toutes les connexions sont prises -> PoolTimeout ;
+      - vérification de vie au checkout (connexion fermée / ping si inactive > ping_after) ;
+      - recyclage des connexions inactives > max_idle (au-delà de minconn) et
+        des connexions plus vieilles que max_lifetime ;
+      - rollback automatique au retour si une transaction est restée ouverte.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=10.0, max_idle=300.0,
+                 max_lifetime=3600.0, ping_after=30.0, name="primary", **connect_kwargs):
+        if maxconn < 1 or minconn < 0 or minconn > maxconn:
+            raise ValueError("Bornes du pool invalides (0 <= minconn <= maxconn, maxconn >= 1)")
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.name = name
+        self.connect_kwargs = connect_kwargs
+        self.query_observer = None    # callable(kind, sql, secondes) pour l'instrumentation
+
+        self._cond = threading.Condition()
+        self._idle = deque()          # connexions disponibles (LIFO : la plus chaude en dernier)
+        self._size = 0                # connexions ouvertes (disponibles + prêtées + en création)
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._warmed = False
+
+        # Statistiques
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_last = 0.0
+
+    # ------------------------------------------------------------------
+    # Connexions brutes
+    # ------------------------------------------------------------------
+    def _connect(self):
+        raw = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        return PooledConnection(self, raw)
+
+    def _discard(self, pc):
+        try:
+            if not pc.raw.closed:
+                pc.raw.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, pc, now):
+        return bool(self.max_lifetime) and (now - pc.created_at) > self.max_lifetime
+
+    def _is_alive(self, pc, now):
+        raw = pc.raw
+        if raw.closed:
+            return False
+        if raw.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if self.ping_after is not None and (now - pc.last_used) >= self.ping_after:
+            try:
+                with raw.cursor() as cur:
+                    cur.execute("SELECT 1")
+                raw.rollback()
+            except Exception:
+                return False
+        return True
+
+    def _prune_idle_locked(self, now):
+        """Retire (sans les fermer) les connexions inactives à recycler. Appelé sous verrou."""
+        stale = []
+        if not self.max_idle:
+            return stale
+        keep = deque()
+        # Les plus anciennes sont en tête de deque.
+        while self._idle:
+            pc = self._idle.popleft()
+            if (now - pc.last_used) > self.max_idle and (self._size - len(stale)) > self.minconn:
+                stale.append(pc)
+            else:
+                keep.append(pc)
+        self._idle = keep
+        self._size -= len(stale)
+        self._discarded += len(stale)
+        return stale
+
+    # ------------------------------------------------------------------
+    # API publique
+    # ------------------------------------------------------------------
+    def warmup(self):
+        """Ouvre minconn connexions d'avance (idempotent)."""
+        with self._cond:
+            if self._warmed or self._closed:
+                return
+            self._warmed = True
+            missing = max(0, self.minconn - self._size)
+            self._size += missing
+        created = []
+        try:
+            for _ in range(missing):
+                created.append(self._connect())
+        finally:
+            with self._cond:
+                self._size -= missing - len(created)
+                self._created += len(created)
+                self._idle.extend(created)
+                self._cond.notify_all()
+
+    def getconn(self, timeout=None):
+        """
+        Emprunte une connexion. Lève PoolTimeout si aucune ne se libère dans
+        `timeout` secondes (défaut : self.timeout).
+        """
+        if not self._warmed:
+            try:
+                self.warmup()
+            except Exception:
+                # Le serveur est peut-être indisponible : on laisse le checkout remonter l'erreur.
+                pass
+
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            pc, create, stale = None, False, []
+            with self._cond:
+                self._waiting += 1
+                try:
+                    while True:
+                        if self._closed:
+                            raise PoolError(f"Pool {self.name!r} fermé")
+                        stale = self._prune_idle_locked(time.monotonic())
+                        if self._idle:
+                            pc = self._idle.pop()
+                            break
+                        if self._size < self.maxconn:
+                            self._size += 1
+                            create = True
+                            break
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(
+                                f"Pool {self.name!r}: aucune connexion libre après {timeout:.1f}s "
+                                f"({self._in_use}/{self.maxconn} utilisées)"
+                            )
+                        self._cond.wait(remaining)
+                    self._in_use += 1
+                finally:
+                    self._waiting -= 1
+
+            for s in stale:
+                self._discard(s)
+
+            now = time.monotonic()
+            if create:
+                try:
+                    pc = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created += 1
+            elif self._is_expired(pc, now) or not self._is_alive(pc, now):
+                # Connexion morte ou trop vieille : on la jette et on recommence.
+                self._discard(pc)
+                with self._cond:
+                    self._size -= 1
+                    self._in_use -= 1
+                    self._discarded += 1
+                    self._cond.notify()
+                continue
+
+            waited = time.monotonic() - start
+            with self._cond:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_last = waited
+                if waited > self._wait_max:
+                    self._wait_max = waited
+            pc.last_used = time.monotonic()
+            return pc
+
+    def putconn(self, pc):
+        """Rend une connexion au pool (rollback si une transaction est restée ouverte)."""
+        if pc.pool is not self:
+            raise PoolError("Connexion étrangère à ce pool")
+        now = time.monotonic()
+        keep = not pc.raw.closed and not self._closed and not self._is_expired(pc, now)
+        if keep:
+            try:
+                status = pc.raw.get_transaction_status()
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    keep = False
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    pc.raw.rollback()
+            except Exception:
+                keep = False
+
+        if not keep:
+            self._discard(pc)
+        pc.last_used = now
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                self._idle.append(pc)
+            else:
+                self._size -= 1
+                self._discarded += 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        pc = self.getconn(timeout=timeout)
+        try:
+            yield pc
+        finally:
+            pc.close()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pc in idle:
+            self._discard(pc)
+
+    def stats(self) -> dict:
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "name": self.name,
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "discarded": self._discarded,
+                "wait_ms_avg": round(self._wait_total * 1000 / checkouts, 3) if checkouts else 0.0,
+                "wait_ms_max": round(self._wait_max * 1000, 3),
+                "wait_ms_last": round(self._wait_last * 1000, 3),
+            }
+
+
+# ----------------------------------------------------------------------
+# Requêtes préparées côté serveur
+# ----------------------------------------------------------------------
+_STMT_NAME_RE = re.compile(r"^[a-z_][a-z0-9_]{0,62}$")
+
+
+class PreparedStatements:
+    """
+    Registre de requêtes préparées. Chaque requête est enregistrée avec des
+    paramètres `%s` (style psycopg2) ; elle est préparée au premier usage sur
+    une connexion donnée, puis exécutée par nom sur cette connexion.
+
+    Les connexions sont suivies par référence faible : une connexion recyclée
+    par le pool emporte ses requêtes préparées.
+
+    Désactivé (enabled=False), execute() envoie simplement le SQL d'origine.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._statements = {}                       # nom -> (sql psycopg2, sql PREPARE)
+        self._prepared = weakref.WeakKeyDictionary()  # connexion brute -> {noms préparés}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, sql: str) -> str:
+        if not _STMT_NAME_RE.match(name):
+            raise ValueError(f"Nom de requête préparée invalide: {name!r}")
+        parts = sql.split("%s")
+        pg_sql = parts[0] + "".join(f"${i}{p}" for i, p in enumerate(parts[1:], 1))
+        self._statements[name] = (sql, pg_sql)
+        self._stats[name] = {"prepares": 0, "executions": 0, "prepare_ms_total": 0.0, "execute_ms_total": 0.0}
+        return name
+
+    def sql(self, name: str) -> str:
+        return self._statements[name][0]
+
+    def execute(self, cur, name: str, params=()):
+        """Exécute la requête `name` sur le curseur `cur` (préparation au besoin)."""
+        sql, pg_sql = self._statements[name]
+        if not self.enabled:
+            t0 = time.perf_counter()
+            cur.execute(sql, params)
+            self._count(name, (time.perf_counter() - t0) * 1000)
+            return cur
+
+        raw = cur.connection
+        with self._lock:
+            names = self._prepared.setdefault(raw, set())
+        if name not in names:
+            t0 = time.perf_counter()
+            cur.execute(f"PREPARE {name} AS {pg_sql}")
+            elapsed = (time.perf_counter() - t0) * 1000
+            names.add(name)
+            with self._lock:
+                st = self._stats[name]
+                st["prepares"] += 1
+                st["prepare_ms_total"] += elapsed
+
+        t0 = time.perf_counter()
+        if params:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cur.execute(f"EXECUTE {name}")
+        self._count(name, (time.perf_counter() - t0) * 1000)
+        return cur
+
+    def _count(self, name, elapsed_ms):
+        with self._lock:
+            st = self._stats[name]
+            st["executions"] += 1
+            st["execute_ms_total"] += elapsed_ms
+
+    def stats(self) -> dict:
+        """
+        Par requête : préparations, exécutions et durées mesurées côté client
+        (aller-retour compris). execute_ms_avg est celle d'un EXECUTE, ou du SQL
+        direct si désactivé : le gain réel se lit en comparant les deux modes.
+        """
+        out = {}
+        with self._lock:
+            for name, st in self._stats.items():
+                prepares, execs = st["prepares"], st["executions"]
+                out[name] = {
+                    "prepares": prepares,
+                    "executions": execs,
+                    "prepare_ms_avg": round(st["prepare_ms_total"] / prepares, 3) if prepares else 0.0,
+                    "execute_ms_avg": round(st["execute_ms_total"] / execs, 3) if execs else 0.0,
+                }
+        return {"enabled": self.enabled, "statements": out}
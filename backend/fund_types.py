@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Types de fonds des budgets, partagés par app.py et app2.py.
+
+FUND_TYPE_MAP normalise les libellés saisis côté front ("Fond 1") vers les
+valeurs stockées en base ("fonds de type 1") ; il est aussi renvoyé au front
+(GET /api/budgets/vocabulary) et sert au rapprochement budget / réel.
+"""
+
+# Dictionnaire de mappage pour normaliser les types de fonds entre le front et la base de données
+FUND_TYPE_MAP = {
+    "Fond 1":         "fonds de type 1",
+    "fonds de type 1":"fonds de type 1",
+    "Fond 3":         "fonds de type 3",
+    "fonds de type 3":"fonds de type 3",
+}
+
+def normalize_fund_type(raw: str) -> str:
+    """
+    Normalise le type de fonds reçu du front-end pour correspondre aux valeurs attendues en base.
+    Args:
+        raw (str): Type de fonds brut (ex: 'Fond 1', 'fonds de type 3').
+    Returns:
+        str: Type de fonds normalisé.
+    Raises:
+        ValueError: Si le type de fonds est invalide.
+    """
+    normalized = FUND_TYPE_MAP.get(raw)
+    if not normalized:
+        raise ValueError(f"Type de fonds invalide: {raw!r}")
+    return normalized
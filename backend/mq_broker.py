@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Courtier de messages local (développement, tests de charge, tests)
+-------------------------------------------------------------------
+Remplaçant minimal de Redis : il parle assez du protocole Redis pour que le
+RedisManager de python-socketio (SOCKETIO_MESSAGE_QUEUE) partage les événements
+entre processus — SUBSCRIBE / UNSUBSCRIBE / PUBLISH / PING, en RESP2 ou RESP3
+(HELLO, négocié par les redis-py récents). Il garde aussi un espace de clés en
+mémoire avec les commandes de cache.RedisCache (GET / SET [PX|EX] / MGET /
+INCR[BY] / EXPIRE / DEL) : il sert donc aussi de CACHE_URL en local et dans
+tests/test_cache.py. Les autres commandes (CLIENT SETINFO, SELECT, ...) reçoivent
++OK et sont ignorées. Ni persistance, ni authentification, ni cluster.
+
+En production, un vrai Redis. Ce module évite seulement d'en installer un pour
+faire tourner plusieurs workers en local et pour loadtest_fanout.py :
+
+  python3 mq_broker.py --port 6390
+  SOCKETIO_MESSAGE_QUEUE=redis://127.0.0.1:6390/0 CACHE_URL=redis://127.0.0.1:6390/0 \
+    gunicorn -k eventlet -w 4 app2:app
+"""
+
+import argparse
+import asyncio
+import time
+
+
+# ---------------------- Encodage RESP ----------------------
+NULL2, NULL3 = b"$-1\r\n", b"_\r\n"   # chaîne nulle en RESP2 / RESP3
+
+def _bulk(value, null=NULL2) -> bytes:
+    if value is None:
+        return null
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+def _array(*items, kind=b"*", null=NULL2) -> bytes:
+    """Agrégat plat : `*` tableau, `>` push (pub/sub RESP3), `%` map (items = clé, valeur, ...)."""
+    n = len(items) // 2 if kind == b"%" else len(items)
+    out = [b"%s%d\r\n" % (kind, n)]
+    for item in items:
+        out.append(b":%d\r\n" % item if isinstance(item, int) else _bulk(item, null))
+    return b"".join(out)
+
+
+async def _read_command(reader):
+    """Une commande, liste d'octets (tableau RESP ou commande en ligne) ; None en fin de flux."""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.strip().split()
+    args = []
+    for _ in range(int(line[1:])):
+        header = await reader.readline()
+        size = int(header[1:])
+        data = await reader.readexactly(size + 2)
+        args.append(data[:-2])
+    return args
+
+
+# ---------------------- Courtier ----------------------
+class Broker:
+    def __init__(self):
+        self.channels = {}  # canal -> {writer: type de trame}
+        self.published = 0
+        self.keys = {}      # clé -> [valeur, expiration (time.monotonic()) ou None]
+
+    def _get(self, key):
+        item = self.keys.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self.keys[key]
+            return None
+        return item
+
+    def _set_expiry(self, key, seconds):
+        item = self._get(key)
+        if item is None:
+            return 0
+        item[1] = time.monotonic() + seconds
+        return 1
+
+    def command(self, name, args, null):
+        """Commandes de l'espace de clés ; None si `name` n'en fait pas partie."""
+        if name == b"GET":
+            item = self._get(args[0])
+            return _bulk(item[0] if item else None, null)
+        if name == b"MGET":
+            return _array(*[(self._get(k) or [None])[0] for k in args], null=null)
+        if name == b"SET":
+            self.keys[args[0]] = [args[1], None]
+            opts = [a.upper() for a in args[2:]]
+            if b"PX" in opts:
+                self._set_expiry(args[0], int(args[2 + opts.index(b"PX") + 1]) / 1000.0)
+            elif b"EX" in opts:
+                self._set_expiry(args[0], int(args[2 + opts.index(b"EX") + 1]))
+            return b"+OK\r\n"
+        if name in (b"INCR", b"INCRBY"):
+            item = self._get(args[0])
+            step = int(args[1]) if name == b"INCRBY" else 1
+            try:
+                value = int(item[0]) + step if item else step
+            except ValueError:
+                return b"-ERR value is not an integer or out of range\r\n"
+            if item:
+                item[0] = b"%d" % value
+            else:
+                self.keys[args[0]] = [b"%d" % value, None]
+            return b":%d\r\n" % value
+        if name == b"EXPIRE":
+            return b":%d\r\n" % self._set_expiry(args[0], int(args[1]))
+        if name == b"DEL":
+            removed = [k for k in dict.fromkeys(args) if self._get(k) is not None]
+            for k in removed:
+                del self.keys[k]
+            return b":%d\r\n" % len(removed)
+        return None
+
+    async def handle(self, reader, writer):
+        subscribed = set()
+        push = b"*"  # trames pub/sub : tableaux en RESP2, pushes en RESP3
+        null = NULL2
+        try:
+            while True:
+                cmd = await _read_command(reader)
+                if cmd is None:
+                    break
+                if not cmd:
+                    continue
+                name = cmd[0].upper()
+                if name == b"SUBSCRIBE":
+                    for ch in cmd[1:]:
+                        subscribed.add(ch)
+                        self.channels.setdefault(ch, {})[writer] = push
+                        writer.write(_array(b"subscribe", ch, len(subscribed), kind=push))
+                elif name == b"UNSUBSCRIBE":
+                    for ch in (cmd[1:] or list(subscribed)):
+                        subscribed.discard(ch)
+                        self.channels.get(ch, {}).pop(writer, None)
+                        writer.write(_array(b"unsubscribe", ch, len(subscribed), kind=push))
+                elif name == b"PUBLISH":
+                    ch, msg = cmd[1], cmd[2]
+                    targets = list(self.channels.get(ch, {}).items())
+                    for w, kind in targets:
+                        w.write(_array(b"message", ch, msg, kind=kind))
+                    self.published += 1
+                    writer.write(b":%d\r\n" % len(targets))
+                elif name == b"PING":
+                    if subscribed:
+                        writer.write(_array(b"pong", cmd[1] if len(cmd) > 1 else b"", kind=push))
+                    else:
+                        writer.write(_bulk(cmd[1]) if len(cmd) > 1 else b"+PONG\r\n")
+                elif name == b"HELLO":
+                    proto = int(cmd[1]) if len(cmd) > 1 else 2
+                    if proto not in (2, 3):
+                        writer.write(b"-NOPROTO unsupported protocol version\r\n")
+                    else:
+                        push = b">" if proto == 3 else b"*"
+                        null = NULL3 if proto == 3 else NULL2
+                        writer.write(_array(b"server", b"redis", b"version", b"7.0.0", b"proto", proto,
+                                            b"mode", b"standalone", b"role", b"master",
+                                            kind=b"%" if proto == 3 else b"*"))
+                elif name == b"QUIT":
+                    writer.write(b"+OK\r\n")
+                    break
+                else:
+                    reply = self.command(name, cmd[1:], null)
+                    writer.write(b"+OK\r\n" if reply is None else reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            pass
+        finally:
+            for ch in subscribed:
+                self.channels.get(ch, {}).pop(writer, None)
+            writer.close()
+
+
+async def serve(host: str, port: int):
+    broker = Broker()
+    server = await asyncio.start_server(broker.handle, host, port)
+    print(f"mq_broker à l'écoute sur redis://{host}:{port}/0", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Courtier pub/sub et clés compatible Redis, minimal (dév / tests de charge)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=6390)
+    args = ap.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
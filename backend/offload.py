@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exécution de travail CPU hors du hub eventlet, avec plafond de concurrence.
+
+Sous eventlet, un appel CPU (bcrypt ~250 ms au coût 12) bloque le hub : plus
+aucune requête ni aucun push Socket.IO n'avance pendant ce temps.
+CpuOffload.run() envoie l'appel dans le pool de threads natifs d'eventlet
+(eventlet.tpool) ; le greenlet appelant cède le hub jusqu'au résultat.
+
+Le sémaphore vient de `threading`, résolu à l'exécution (vert sous
+monkey_patch) : au-delà de `max_concurrency` appels simultanés, les greenlets
+attendent leur tour sans occuper de thread. La file (waiting) et les temps
+d'attente sont exposés par stats().
+
+Sans eventlet, run() exécute simplement l'appel dans le thread courant.
+"""
+
+import time
+import threading
+
+try:
+    from eventlet import tpool
+except Exception:
+    tpool = None
+
+
+class CpuOffload:
+    def __init__(self, name: str, max_concurrency: int = 2):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._waiting_max = 0
+        self._calls = 0
+        self._errors = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+        self._run_ms_total = 0.0
+
+    def run(self, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+            self._waiting_max = max(self._waiting_max, self._waiting)
+        try:
+            self._slots.acquire()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        t1 = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            if tpool is not None:
+                return tpool.execute(fn, *args, **kwargs)
+            return fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            self._slots.release()
+            t2 = time.perf_counter()
+            with self._lock:
+                self._in_flight -= 1
+                self._calls += 1
+                wait_ms = (t1 - t0) * 1000
+                self._wait_ms_total += wait_ms
+                self._wait_ms_max = max(self._wait_ms_max, wait_ms)
+                self._run_ms_total += (t2 - t1) * 1000
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = self._calls
+            return {
+                "name": self.name,
+                "max_concurrency": self.max_concurrency,
+                "threaded": tpool is not None,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "waiting_max": self._waiting_max,
+                "calls": calls,
+                "errors": self._errors,
+                "wait_ms_avg": round(self._wait_ms_total / calls, 2) if calls else 0.0,
+                "wait_ms_max": round(self._wait_ms_max, 2),
+                "run_ms_avg": round(self._run_ms_total / calls, 2) if calls else 0.0,
+            }
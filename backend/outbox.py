@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Boîte d'envoi transactionnelle des événements temps réel (table event_outbox).
+
+Écriture : write_events(conn, events) insère les événements dans la transaction
+de la modification de données ; ils n'existent que si elle est validée. Un
+trigger par instruction appelle pg_notify('event_outbox') (NOTIFY n'est délivré
+qu'au commit).
+
+Relais : OutboxDispatcher tourne dans chaque processus (thread vert sous
+eventlet) sur une connexion dédiée en autocommit, LISTEN event_outbox, et remet
+les nouveaux événements à `deliver(events)` — une liste par transaction, dans
+l'ordre d'écriture — qui les émet vers les sockets du processus.
+
+Exactement une fois, après commit : l'ordre des id (bigserial) n'est pas
+l'ordre des commits ; le relais avance donc par identifiant de transaction.
+Chaque ligne porte txid_current() ; une passe lit les lignes dont le txid est
+dans [borne précédente, xmin du snapshot courant) : toutes ces transactions sont
+terminées, aucune ligne ne peut encore apparaître dans l'intervalle. Contrepartie :
+une transaction d'écriture longue retarde les événements jusqu'à sa fin.
+
+Sans notification (connexion perdue, NOTIFY manqué), une passe a lieu toutes
+les `poll_interval` secondes. Les lignes plus vieilles que `retention` secondes
+sont supprimées régulièrement.
+"""
+
+import logging
+import select
+import threading
+import time
+
+import psycopg2
+import psycopg2.extras
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "event_outbox"
+
+
+def write_events(conn, events):
+    """events : [(rooms, event, payload_json_text), ...] dans la transaction en cours de `conn`."""
+    if not events:
+        return
+    cur = conn.cursor()
+    try:
+        psycopg2.extras.execute_values(
+            cur,
+            "INSERT INTO event_outbox (rooms, event, payload) VALUES %s",
+            [(list(rooms), event, payload) for rooms, event, payload in events],
+            template="(%s, %s, %s::jsonb)",
+        )
+    finally:
+        cur.close()
+
+
+class OutboxDispatcher:
+    def __init__(self, dsn, deliver, poll_interval=2.0, retention=3600.0,
+                 settle_delay=0.05, settle_tries=20, reconnect_delay=5.0):
+        self.dsn = dsn
+        self.deliver = deliver
+        self.poll_interval = float(poll_interval)
+        self.retention = float(retention)
+        self.settle_delay = float(settle_delay)
+        self.settle_tries = int(settle_tries)
+        self.reconnect_delay = float(reconnect_delay)
+        self._lo = None            # premier txid pas encore relayé
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stop = False
+        self._last_purge = 0.0
+        self._stats = {"delivered": 0, "transactions": 0, "wakeups": 0, "polls": 0,
+                       "errors": 0, "purged": 0, "last_error": None}
+
+    # ---------------------- Cycle de vie ----------------------
+    def start(self):
+        """Démarre le relais une seule fois par processus (appel idempotent)."""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop = True
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+                    if self._lo is None:
+                        # Premier démarrage : seuls les événements à venir. Après une
+                        # reconnexion, on reprend là où on s'était arrêté.
+                        cur.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+                        self._lo = cur.fetchone()[0]
+                self._loop(conn)
+            except Exception as e:
+                self._stats["errors"] += 1
+                self._stats["last_error"] = str(e)
+                log.warning(f"Relais event_outbox interrompu: {e}")
+                time.sleep(self.reconnect_delay)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _loop(self, conn):
+        self.drain(conn)
+        while not self._stop:
+            ready, _, _ = select.select([conn], [], [], self.poll_interval)
+            if ready:
+                conn.poll()
+                notified = bool(conn.notifies)
+                conn.notifies.clear()
+            else:
+                notified = False
+            self._stats["wakeups" if notified else "polls"] += 1
+            n = self.drain(conn)
+            # Notifié mais rien de lisible : une autre transaction d'écriture plus
+            # ancienne retient le xmin ; on réessaie brièvement plutôt que
+            # d'attendre la prochaine passe.
+            tries = 0
+            while notified and n == 0 and tries < self.settle_tries:
+                time.sleep(self.settle_delay)
+                n = self.drain(conn)
+                tries += 1
+            self._purge(conn)
+
+    # ---------------------- Relais ----------------------
+    def drain(self, conn) -> int:
+        with conn.cursor() as cur:
+            cur.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+            hi = cur.fetchone()[0]
+            if hi <= self._lo:
+                return 0
+            cur.execute("""
+                SELECT txid, rooms, event, payload FROM event_outbox
+                WHERE txid >= %s AND txid < %s
+                ORDER BY txid, id
+            """, (self._lo, hi))
+            rows = cur.fetchall()
+        self._lo = hi
+        tx, events = None, []
+        for txid, rooms, event, payload in rows:
+            if txid != tx and events:
+                self._deliver(events)
+                events = []
+            tx = txid
+            events.append((tuple(rooms), event, payload))
+        if events:
+            self._deliver(events)
+        return len(rows)
+
+    def _deliver(self, events):
+        try:
+            self.deliver(events)
+            self._stats["delivered"] += len(events)
+            self._stats["transactions"] += 1
+        except Exception as e:
+            self._stats["errors"] += 1
+            self._stats["last_error"] = str(e)
+            log.warning(f"Émission d'événements échouée: {e}")
+
+    def _purge(self, conn):
+        now = time.monotonic()
+        if now - self._last_purge < min(60.0, self.retention / 10):
+            return
+        self._last_purge = now
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM event_outbox WHERE created_at < now() - make_interval(secs => %s)",
+                (self.retention,),
+            )
+            self._stats["purged"] += cur.rowcount
+
+    def stats(self) -> dict:
+        return dict(self._stats, running=self.running, next_txid=self._lo)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sérialisation JSON rapide des lignes psycopg2.
+
+RowSerializer est construit une fois par requête à partir de cursor.description :
+chaque colonne reçoit un convertisseur choisi d'après l'OID de son type
+(numeric -> float, timestamptz/timestamp -> ISO 8601 en UTC si naïf, date -> ISO 8601,
+autres -> tel quel), au lieu de tester le type de chaque cellule.
+
+dumps() encode avec orjson s'il est installé, sinon avec json (séparateurs compacts).
+Le résultat est identique à convert_to_json_serializable() + json.dumps().
+"""
+
+import json
+from datetime import datetime, date, timezone
+from decimal import Decimal
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
+# OID des types PostgreSQL (pg_type) qui demandent une conversion
+OID_NUMERIC = 1700
+OID_DATE = 1082
+OID_TIMESTAMP = 1114
+OID_TIMESTAMPTZ = 1184
+
+
+def _conv_numeric(v):
+    return None if v is None else float(v)
+
+
+def _conv_timestamptz(v):
+    return None if v is None else v.isoformat()
+
+
+def _conv_timestamp(v):
+    if v is None:
+        return None
+    if v.tzinfo is None:
+        v = v.replace(tzinfo=timezone.utc)
+    return v.isoformat()
+
+
+def _conv_date(v):
+    return None if v is None else v.isoformat()
+
+
+CONVERTERS_BY_OID = {
+    OID_NUMERIC: _conv_numeric,
+    OID_DATE: _conv_date,
+    OID_TIMESTAMP: _conv_timestamp,
+    # timestamptz arrive toujours avec un fuseau, mais on reste tolérant
+    OID_TIMESTAMPTZ: _conv_timestamp,
+}
+
+
+class RowSerializer:
+    """
+    Convertit des lignes (tuples ou DictRow) en dicts prêts pour JSON.
+    `description` : cursor.description (ou séquence de (nom, oid, ...)).
+    """
+
+    __slots__ = ("names", "converters", "_typed")
+
+    def __init__(self, description):
+        self.names = [d[0] for d in description]
+        self.converters = [CONVERTERS_BY_OID.get(d[1]) for d in description]
+        # Indices des colonnes à convertir ; les autres passent telles quelles
+        self._typed = [(i, c) for i, c in enumerate(self.converters) if c is not None]
+
+    @classmethod
+    def for_cursor(cls, cur):
+        return cls(cur.description)
+
+    def row(self, r) -> dict:
+        if not self._typed:
+            return dict(zip(self.names, r))
+        values = list(r)
+        for i, conv in self._typed:
+            values[i] = conv(values[i])
+        return dict(zip(self.names, values))
+
+    def rows(self, rows) -> list:
+        return [self.row(r) for r in rows]
+
+
+# ----------------------------------------------------------------------
+# Encodage JSON
+# ----------------------------------------------------------------------
+def _default(obj):
+    """Repli pour les objets hors lignes typées (payloads construits à la main)."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, datetime):
+        return _conv_timestamp(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Type non sérialisable en JSON: {type(obj).__name__}")
+
+
+if HAS_ORJSON:
+    _ORJSON_OPTS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTS)
+
+    def loads(s):
+        return orjson.loads(s)
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(s):
+        return json.loads(s)
+
+
+class _SocketIOJSON:
+    """Adaptateur pour SocketIO(json=...) : mêmes dumps/loads que les réponses HTTP."""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs) -> str:
+        return dumps(obj).decode("utf-8")
+
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return loads(s)
+
+
+socketio_json = _SocketIOJSON()
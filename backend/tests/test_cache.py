@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Caches à étiquettes (cache.py). RedisCache est exercé contre mq_broker.py
+démarré dans le processus (port libre) : python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import LocalCache, RedisCache  # noqa: E402
+from mq_broker import Broker  # noqa: E402
+
+try:
+    import redis
+except ImportError:  # dépendance optionnelle (CACHE_URL=redis://...)
+    redis = None
+
+
+def start_broker():
+    """mq_broker dans un thread ; renvoie l'URL redis:// du port choisi."""
+    ready = threading.Event()
+    box = {}
+
+    async def main():
+        server = await asyncio.start_server(Broker().handle, "127.0.0.1", 0)
+        box["port"] = server.sockets[0].getsockname()[1]
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+    ready.wait(5)
+    return f"redis://127.0.0.1:{box['port']}/0"
+
+
+class LocalCacheTest(unittest.TestCase):
+    def test_invalidation(self):
+        c = LocalCache("t")
+        hit, _, stamp = c.lookup("k", ["a"])
+        self.assertFalse(hit)
+        c.store("k", "v", stamp)
+        self.assertEqual(c.lookup("k", ["a"])[:2], (True, "v"))
+        c.invalidate_tags("a")
+        self.assertFalse(c.lookup("k", ["a"])[0])
+
+    def test_tag_versions_bounded(self):
+        c = LocalCache("t", default_ttl=0.05, max_tags=10)
+        _, _, stamp = c.lookup("old", ["cdd:0"])
+        c.store("old", "périmée", stamp)
+        for i in range(10):
+            c.invalidate_tags(f"cdd:{i}")
+        time.sleep(0.1)
+        c.invalidate_tags("cdd:new")
+        self.assertEqual(c.stats()["tags"], 1)
+        # cdd:0 est oubliée (version 0) : l'entrée d'avant son invalidation a expiré
+        self.assertFalse(c.lookup("old", ["cdd:0"])[0])
+
+
+@unittest.skipIf(redis is None, "paquet redis absent")
+class RedisCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.url = start_broker()
+
+    def test_stamp_invalidation_across_instances(self):
+        w1 = RedisCache(self.url, "ns1", default_ttl=30)
+        w2 = RedisCache(self.url, "ns1", default_ttl=30)
+        events = []
+        w2.subscribe(events.append)
+        time.sleep(0.2)  # abonnement établi
+
+        hit, _, stamp = w1.lookup("budget_summary:2025", ["budgets:2025"])
+        self.assertFalse(hit)
+        w1.store("budget_summary:2025", b"corps", stamp)
+        self.assertEqual(w2.lookup("budget_summary:2025", ["budgets:2025"])[:2], (True, b"corps"))
+
+        # Chargement commencé sur w2 avant l'invalidation faite par w1
+        _, _, stale_stamp = w2.lookup("budget_vs_actual:2025", ["budgets:2025"])
+        w1.invalidate_tags("budgets:2025")
+        w2.store("budget_vs_actual:2025", {"périmé": True}, stale_stamp)
+
+        self.assertFalse(w2.lookup("budget_summary:2025", ["budgets:2025"])[0])
+        self.assertFalse(w2.lookup("budget_vs_actual:2025", ["budgets:2025"])[0])
+
+        deadline = time.time() + 2
+        while not events and time.time() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(events, [{"type": "invalidate", "tags": ["budgets:2025"]}])
+        self.assertLess(w2.invalidated_since("budgets:2025"), 2)
+        self.assertEqual(w1.stats()["errors"], 0)
+        self.assertEqual(w2.stats()["errors"], 0)
+
+    def test_entry_expiry(self):
+        c = RedisCache(self.url, "ns2")
+        _, _, stamp = c.lookup("k", [])
+        c.store("k", "v", stamp, ttl=0.05)
+        self.assertEqual(c.lookup("k", [])[:2], (True, "v"))
+        time.sleep(0.1)
+        self.assertFalse(c.lookup("k", [])[0])
+
+
+if __name__ == "__main__":
+    unittest.main()